@@ -1,52 +1,144 @@
 from __future__ import annotations
 
-import argparse
+import functools
 import os
 import platform
 import re
 import shlex
+import stat
 import sys
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Tuple
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple, Union
 from urllib.parse import quote
 
-try:
-    import pyperclip  # type: ignore
-except Exception:  # pragma: no cover - only used at runtime
-    pyperclip = None  # type: ignore
+if TYPE_CHECKING:
+    import argparse
 
-_ALLOWED_HEADERS = {
+_ALLOWED_HEADERS = frozenset({
     "cookie",
     "origin",
     "referer",
     "user-agent",
+})
+
+_HEADER_FLAGS = ("-h", "--header")
+_URL_PREFIXES = ("http://", "https://")
+
+# One piece of a bash word per match; words end at unquoted whitespace.
+_SHELL_PIECE = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<ansi_c>\$'(?:[^'\\]|\\.)*')
+  | (?P<single>'[^']*')
+  | (?P<double>"(?:[^"\\]|\\.)*")
+  | (?P<escape>\\(?:\r?\n|.))
+  | (?P<plain>[^\s'"\\$]+|\$)
+""", re.VERBOSE | re.DOTALL)
+_DOUBLE_QUOTE_ESCAPE = re.compile(r'\\(?:([\\"$`])|\r?\n)')
+_ANSI_C_ESCAPE = re.compile(
+    r"\\(?:([0-7]{1,3})|x([0-9A-Fa-f]{1,2})|u([0-9A-Fa-f]{1,4})|U([0-9A-Fa-f]{1,8})|c(.)|(.))",
+    re.DOTALL,
+)
+_ANSI_C_CHARS = {
+    "a": "\a", "b": "\b", "e": "\x1b", "E": "\x1b", "f": "\f", "n": "\n",
+    "r": "\r", "t": "\t", "v": "\v", "\\": "\\", "'": "'", '"': '"', "?": "?",
 }
 
-_URL_PATTERN = re.compile(r"""['"]?(https?://[^\s'"]+)['"]?""")
-_HEADER_PATTERN = re.compile(
-    r"(?:^|\s)(?:-H|--header)\s+(?:'([^']+)'|\"([^\"]+)\"|([^\s]+))",
-    re.IGNORECASE,
-)
+def _decode_ansi_c_escape(match: re.Match) -> str:
+    octal, hex2, hex4, hex8, ctrl, char = match.groups()
+    if char is not None:
+        return _ANSI_C_CHARS.get(char, match.group(0))
+    if ctrl is not None:
+        return chr(ord(ctrl) & 0x1F)
+    if octal is not None:
+        return chr(int(octal, 8) & 0xFF)
+    code = int(hex2 or hex4 or hex8, 16)
+    return chr(code) if code <= 0x10FFFF else match.group(0)
+
+def _split_command(command: str) -> List[str]:
+    """Split a curl command into words the way bash would.
+
+    Handles '...', "...", backslash escapes, line continuations and, at
+    the start of a word, $'...' (ANSI-C quoting, which browsers' "Copy as
+    cURL (bash)" emits). Parsing stops at an unterminated quote and keeps
+    the words completed before it, so a malformed body cannot hide the URL.
+    """
+    words: List[str] = []
+    parts: List[str] = []
+    in_word = False
+    pos = 0
+    while pos < len(command):
+        m = _SHELL_PIECE.match(command, pos)
+        if m is None:  # unterminated quote or trailing backslash
+            in_word = False
+            break
+        pos = m.end()
+        kind = m.lastgroup
+        text = m.group()
+        if kind == "space":
+            if in_word:
+                words.append("".join(parts))
+                parts = []
+                in_word = False
+            continue
+        if kind == "escape":
+            if text[1:] in ("\n", "\r\n"):
+                continue
+            parts.append(text[1:])
+        elif kind == "ansi_c":
+            if in_word:
+                # Only a word-initial $'...' is ANSI-C; otherwise '$' is
+                # literal and the quote is scanned again on its own.
+                parts.append("$")
+                pos = m.start() + 1
+            else:
+                parts.append(_ANSI_C_ESCAPE.sub(_decode_ansi_c_escape, text[2:-1]))
+        elif kind == "single":
+            parts.append(text[1:-1])
+        elif kind == "double":
+            parts.append(_DOUBLE_QUOTE_ESCAPE.sub(lambda e: e.group(1) or "", text[1:-1]))
+        else:
+            parts.append(text)
+        in_word = True
+    if in_word:
+        words.append("".join(parts))
+    return words
 
 def parse_curl(curl_command: str,
                *,
                allowed_headers: Optional[Iterable[str]] = None,
                include_all_headers: bool = False) -> Tuple[Optional[str], Dict[str, str]]:
     """Extract the first URL and headers from a curl command."""
-    url_match = _URL_PATTERN.search(curl_command)
-    url = url_match.group(1) if url_match else None
+    tokens = _split_command(curl_command)
 
+    url: Optional[str] = None
     headers: Dict[str, str] = {}
-    allow = set(h.lower() for h in (allowed_headers or _ALLOWED_HEADERS))
-    for h1, h2, h3 in _HEADER_PATTERN.findall(curl_command):
-        raw = h1 or h2 or h3
-        if ":" not in raw:
-            continue
-        key, value = raw.split(":", 1)
-        k = key.strip()
-        v = value.strip()
-        if include_all_headers or k.lower() in allow:
-            headers[k] = v
+    allow = _ALLOWED_HEADERS if allowed_headers is None else frozenset(h.lower() for h in allowed_headers)
+    i = 0
+    while i < len(tokens):
+        tok = tokens[i]
+        i += 1
+        flag = tok.lower()
+        if flag in _HEADER_FLAGS:
+            if i >= len(tokens):
+                break
+            raw = tokens[i]
+            i += 1
+            if ":" not in raw:
+                continue
+            key, value = raw.split(":", 1)
+            k = key.strip()
+            v = value.strip()
+            if include_all_headers or k.lower() in allow:
+                headers[k] = v
+        elif url is None:
+            if flag == "--url" and i < len(tokens):
+                tok = tokens[i]
+                i += 1
+            elif flag.startswith("--url="):
+                tok = tok[len("--url="):]
+            if tok.startswith(_URL_PREFIXES):
+                url = tok
     return url, headers
 
 def kodi_strm_content(url: str, headers: Dict[str, str]) -> str:
@@ -54,39 +146,44 @@ def kodi_strm_content(url: str, headers: Dict[str, str]) -> str:
     if not url:
         raise ValueError("No URL found in curl command.")
     if headers:
-        header_str = "|" + "&".join(f"{k}={quote(v)}" for k, v in headers.items())
+        parts = [k + "=" + quote(v) for k, v in headers.items()]
+        header_str = "|" + "&".join(parts)
         return f"{url}{header_str}"
     return url
 
-_INVALID_FILENAME_CHARS = re.compile(r"[\\/*?:\"<>|]\s*")
+_UNSAFE_FILENAME_CHARS = '\\/*?:"<>|'
+_SANITIZE_TABLE = str.maketrans({c: "_" for c in _UNSAFE_FILENAME_CHARS})
 
 
 
 def sanitize_filename(name: str) -> str:
-    base = os.path.splitext(name)[0]
-    cleaned = re.sub(r'[\/*?:"<>|]', "_", base)
-    return cleaned if cleaned else "output"
+    if not name:
+        return "output"
+    base = os.path.splitext(name)[0] if "." in name else name
+    if not any(c in base for c in _UNSAFE_FILENAME_CHARS):
+        return base or "output"
+    return base.translate(_SANITIZE_TABLE) or "output"
 
 def construct_yt_dlp_args(url: str, headers: Dict[str, str], output_name: Optional[str]) -> List[str]:
     args: List[str] = ["yt-dlp"]
     for k, v in headers.items():
-        args.extend(["--add-header", f"{k}: {v}"])
+        args += ("--add-header", k + ": " + v)
     args.append(url)
     if output_name:
-        args.extend(["-o", f"{output_name}.%(ext)s"])
+        args += ("-o", f"{output_name}.%(ext)s")
     return args
 
 def _sh_join(args: List[str]) -> str:
-    try:
-        return shlex.join(args)
-    except Exception:  # pragma: no cover
-        return " ".join(shlex.quote(a) for a in args)
+    return shlex.join(args)
+
+_BAT_NEEDS_QUOTE = re.compile(r"[\s()%!^&<>|,;]")
+_PS1_NEEDS_QUOTE = re.compile(r"[\s()!^&<>|,;]")
 
 def _bat_join(args: List[str]) -> str:
     def q(a: str) -> str:
         if not a:
             return '""'
-        if any(c.isspace() for c in a) or any(c in a for c in '()%!^&<>|,;'):
+        if _BAT_NEEDS_QUOTE.search(a):
             return '"' + a.replace('"', '""') + '"'
         return a
     return " ".join(q(a) for a in args)
@@ -95,30 +192,56 @@ def _ps1_join(args: List[str]) -> str:
     def q(a: str) -> str:
         if a == "":
             return "''"
-        if re.search(r"\s|[()!^&<>|,;]", a):
+        if _PS1_NEEDS_QUOTE.search(a):
             return "'" + a.replace("'", "''") + "'"
         return a
     return " ".join(q(a) for a in args)
 
+# Script format -> (file suffix, first line, argument joiner).
+_SCRIPT_FORMATS = {
+    "sh": (".sh", "#!/bin/sh", _sh_join),
+    "bat": (".bat", "@echo off", _bat_join),
+    "ps1": (".ps1", "# PowerShell script", _ps1_join),
+}
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    """Write data to a new sibling file, fsync it, then rename it over path.
+
+    Symlinks are followed so the link target is replaced, and an existing
+    file keeps its permission bits.
+    """
+    target = Path(os.path.realpath(path))
+    try:
+        mode: Optional[int] = stat.S_IMODE(os.stat(target).st_mode)
+    except FileNotFoundError:
+        mode = None
+    tmp = target.with_name(f".{target.name}.{os.urandom(6).hex()}.tmp")
+    # O_EXCL never reuses an existing file; the kernel applies the umask.
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0), 0o666)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if mode is not None:
+            os.chmod(tmp, mode)
+        os.replace(tmp, target)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
 def write_shell_script(filename: Path, args: List[str], fmt: str = "sh") -> None:
     fmt = fmt.lower()
-    filename = filename.with_suffix({
-        "sh": ".sh",
-        "bat": ".bat",
-        "ps1": ".ps1",
-    }.get(fmt, ".sh"))
-
-    if fmt == "bat":
-        content = _bat_join(args)
-        text = f"@echo off\n{content}\n"
-    elif fmt == "ps1":
-        content = _ps1_join(args)
-        text = f"# PowerShell script\n{content}\n"
-    else:
-        content = _sh_join(args)
-        text = f"#!/bin/sh\n{content}\n"
-
-    filename.write_text(text, encoding="utf-8")
+    suffix, prolog, join = _SCRIPT_FORMATS.get(fmt, _SCRIPT_FORMATS["sh"])
+    filename = filename.with_suffix(suffix)
+    content = join(args)
+
+    # Same line endings write_text() would produce, emitted in one bytes write.
+    nl = os.linesep
+    _write_atomic(filename, f"{prolog}{nl}{content}{nl}".encode("utf-8"))
     if fmt == "sh":
         try:
             os.chmod(filename, 0o755)
@@ -131,15 +254,40 @@ def guess_default_script_format() -> str:
         return "bat"
     return "sh"
 
+@functools.lru_cache(maxsize=None)
+def _default_script_format() -> str:
+    # The platform cannot change while the process runs; probe it once,
+    # and only when arguments are actually parsed.
+    return guess_default_script_format()
+
 def get_curl_from_clipboard() -> str:
-    if pyperclip is None:
-        raise ImportError("pyperclip is required for clipboard support. Install it with 'pip install pyperclip'.")
+    # Imported lazily: pyperclip probes the platform on import and is only
+    # needed when no curl command is given.
+    try:
+        import pyperclip  # type: ignore
+    except ImportError:
+        raise ImportError("pyperclip is required for clipboard support. Install it with 'pip install pyperclip'.") from None
     text = pyperclip.paste()  # type: ignore[attr-defined]
     if not text or not text.strip():
         raise ValueError("Clipboard is empty; provide a curl command or copy one first.")
     return text
 
-def main(argv: Optional[List[str]] = None) -> int:
+_VALUE_OPTIONS = {
+    "-t": "title",
+    "--title": "title",
+    "-o": "output",
+    "--output": "output",
+    "--script-format": "script_format",
+}
+_FLAG_OPTIONS = {
+    "--yt-dlp": "yt_dlp",
+    "--all-headers": "all_headers",
+    "--dry-run": "dry_run",
+}
+
+def _build_parser() -> argparse.ArgumentParser:
+    import argparse
+
     parser = argparse.ArgumentParser(
         description=(
             "Convert a curl command to a Kodi .strm file and optional yt-dlp script. "
@@ -152,8 +300,59 @@ def main(argv: Optional[List[str]] = None) -> int:
     parser.add_argument("--yt-dlp", action="store_true", help="Emit a yt-dlp script and print the command.")
     parser.add_argument("--all-headers", action="store_true", help="Include all headers from the curl command (ignore whitelist).")
     parser.add_argument("--dry-run", action="store_true", help="Print what would be written without creating files.")
-    parser.add_argument("--script-format", choices=["sh", "bat", "ps1"], default=guess_default_script_format(), help="Format of the generated script when --yt-dlp is used.")
-    args = parser.parse_args(argv)
+    parser.add_argument("--script-format", choices=list(_SCRIPT_FORMATS), default=_default_script_format(), help="Format of the generated script when --yt-dlp is used.")
+    return parser
+
+def _fast_parse_args(argv: List[str]) -> Optional[SimpleNamespace]:
+    """Parse the common, well-formed command lines without importing argparse.
+
+    Returns None for anything it does not handle (--help, abbreviations,
+    unknown options, missing or invalid values) so the caller can fall
+    back to argparse for the full behaviour and error messages.
+    """
+    ns = SimpleNamespace(
+        curl_command=None,
+        title=None,
+        output=None,
+        yt_dlp=False,
+        all_headers=False,
+        dry_run=False,
+        script_format=_default_script_format(),
+    )
+    i = 0
+    while i < len(argv):
+        tok = argv[i]
+        i += 1
+        if not tok.startswith("-") or tok == "-":
+            if ns.curl_command is not None:
+                return None
+            ns.curl_command = tok
+        elif tok in _FLAG_OPTIONS:
+            setattr(ns, _FLAG_OPTIONS[tok], True)
+        else:
+            opt, eq, value = tok.partition("=")
+            if opt not in _VALUE_OPTIONS or (eq and not opt.startswith("--")):
+                return None
+            if not eq:
+                if i >= len(argv) or argv[i].startswith("-"):
+                    return None
+                value = argv[i]
+                i += 1
+            if opt == "--script-format" and value not in _SCRIPT_FORMATS:
+                return None
+            setattr(ns, _VALUE_OPTIONS[opt], value)
+    return ns
+
+def _parse_args(argv: Optional[List[str]]) -> Union[SimpleNamespace, argparse.Namespace]:
+    if argv is None:
+        argv = sys.argv[1:]
+    args = _fast_parse_args(argv)
+    if args is None:
+        args = _build_parser().parse_args(argv)
+    return args
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = _parse_args(argv)
 
     try:
         curl_cmd = args.curl_command if args.curl_command else get_curl_from_clipboard()
@@ -162,7 +361,7 @@ def main(argv: Optional[List[str]] = None) -> int:
 
         url, headers = parse_curl(curl_cmd, include_all_headers=args.all_headers)
         if not url:
-            parser.error("Could not find a valid URL in the provided curl command.")
+            _build_parser().error("Could not find a valid URL in the provided curl command.")
 
         if not headers and not args.all_headers:
             print("Note: No whitelisted headers found. Use --all-headers to include all provided headers.", file=sys.stderr)
@@ -177,19 +376,15 @@ def main(argv: Optional[List[str]] = None) -> int:
         print(strm_content)
 
         if not args.dry_run:
-            strm_path.write_text(strm_content, encoding="utf-8")
+            _write_atomic(strm_path, strm_content.encode("utf-8"))
             print(f".strm file written: {strm_path}")
         else:
             print("(dry-run) .strm file not written")
 
         if args.yt_dlp:
             yt_args = construct_yt_dlp_args(url, headers, base_output)
-            if args.script_format == "bat":
-                joined = _bat_join(yt_args)
-            elif args.script_format == "ps1":
-                joined = _ps1_join(yt_args)
-            else:
-                joined = _sh_join(yt_args)
+            _, _, join = _SCRIPT_FORMATS.get(args.script_format, _SCRIPT_FORMATS["sh"])
+            joined = join(yt_args)
 
             print("yt-dlp command:")
             print(joined)
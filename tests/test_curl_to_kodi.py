@@ -1,5 +1,9 @@
+import os
 import re
-from curl_to_kodi.cli import parse_curl, kodi_strm_content, sanitize_filename, construct_yt_dlp_args
+
+import pytest
+
+from curl_to_kodi.cli import parse_curl, kodi_strm_content, sanitize_filename, construct_yt_dlp_args, write_shell_script, _build_parser, _fast_parse_args, _write_atomic
 
 def test_parse_basic_url_and_headers():
     cmd = "curl 'https://example.com/v.mp4' -H 'User-Agent: UA' -H \"Referer: https://ref\" -H cookie: a=b"
@@ -20,6 +24,7 @@ def test_kodi_strm_content():
 
 def test_sanitize_filename():
     assert sanitize_filename("bad:name*here?.mp4") == "bad_name_here_"
+    assert sanitize_filename("a\\b") == "a_b"
     assert sanitize_filename("") == "output"
 
 def test_construct_yt_dlp_args():
@@ -29,8 +34,102 @@ def test_construct_yt_dlp_args():
     assert "-o" in args and "out.%(ext)s" in args
 
 
+@pytest.mark.parametrize("fmt, first_line, command", [
+    ("sh", "#!/bin/sh", "yt-dlp --add-header 'Referer: r x' https://a/b -o 'x.%(ext)s'"),
+    ("bat", "@echo off", 'yt-dlp --add-header "Referer: r x" https://a/b -o "x.%(ext)s"'),
+    ("ps1", "# PowerShell script", "yt-dlp --add-header 'Referer: r x' https://a/b -o 'x.%(ext)s'"),
+])
+def test_write_shell_script(tmp_path, fmt, first_line, command):
+    args = construct_yt_dlp_args("https://a/b", {"Referer": "r x"}, "x")
+    write_shell_script(tmp_path / "x", args, fmt=fmt)
+    script = tmp_path / f"x.{fmt}"
+    assert script.read_text(encoding="utf-8").splitlines() == [first_line, command]
+    if fmt == "sh":
+        assert script.stat().st_mode & 0o777 == 0o755
+
+
 def test_parse_unquoted_header_no_space():
     cmd = "curl https://example.com -H X-Token:abc"
     url, headers = parse_curl(cmd, include_all_headers=True)
     assert url == "https://example.com"
     assert headers["X-Token"] == "abc"
+
+
+def test_parse_browser_command_with_ansi_c_body():
+    cmd = (
+        "curl 'https://example.com/api/play' \\\n"
+        "  -H 'accept: */*' \\\n"
+        "  -H $'referer: https://example.com/it\\'s' \\\n"
+        "  -H 'user-agent: Mozilla/5.0' \\\n"
+        "  --data-raw $'{\"title\":\"Don\\'t stop\"}'"
+    )
+    url, headers = parse_curl(cmd)
+    assert url == "https://example.com/api/play"
+    assert headers == {"referer": "https://example.com/it's", "user-agent": "Mozilla/5.0"}
+
+
+def test_parse_unbalanced_quote_keeps_earlier_words():
+    cmd = "curl https://example.com -H 'Referer: r' --data-raw 'oops"
+    assert parse_curl(cmd) == ("https://example.com", {"Referer": "r"})
+
+
+def test_parse_line_continuations():
+    cmd = "curl 'https://ex.com/a'\\\n  -H 'Referer: r' \\\r\n  -H 'Origin: o'"
+    assert parse_curl(cmd) == ("https://ex.com/a", {"Referer": "r", "Origin": "o"})
+
+
+def test_parse_url_option_and_case_insensitive_header_flag():
+    cmd = "curl --url=https://ex.com/a --HEADER 'Referer: r'"
+    assert parse_curl(cmd) == ("https://ex.com/a", {"Referer": "r"})
+    assert parse_curl("curl --url https://ex.com/b")[0] == "https://ex.com/b"
+
+
+def test_parse_keeps_dollar_quote_inside_quotes():
+    cmd = """curl 'https://ex.com/a' -H "Cookie: a= $'x'" -H 'X-Price: 5 $' -H 'Referer: r'"""
+    url, headers = parse_curl(cmd, include_all_headers=True)
+    assert url == "https://ex.com/a"
+    assert headers == {"Cookie": "a= $'x'", "X-Price": "5 $", "Referer": "r"}
+
+
+def test_parse_ansi_c_escapes():
+    cmd = "curl https://ex.com -H $'Referer: https://ex.com/caf\\u00e9/\\xe9\\t\\101'"
+    assert parse_curl(cmd)[1] == {"Referer": "https://ex.com/caf\u00e9/\xe9\tA"}
+
+
+def test_parse_mixed_quoting():
+    cmd = """curl "https://example.com/a b.m3u8" -H 'Referer: https://ref' --header "User-Agent: it's UA" """
+    url, headers = parse_curl(cmd)
+    assert url == "https://example.com/a b.m3u8"
+    assert headers == {"Referer": "https://ref", "User-Agent": "it's UA"}
+
+
+def test_write_atomic(tmp_path, monkeypatch):
+    target = tmp_path / "out.strm"
+    target.write_bytes(b"old")
+    os.chmod(target, 0o640)
+    link = tmp_path / "link.strm"
+    link.symlink_to(target)
+
+    _write_atomic(link, "https://ex|a=b\n".encode("utf-8"))
+    assert target.read_bytes() == b"https://ex|a=b\n"
+    assert link.is_symlink()
+    assert target.stat().st_mode & 0o777 == 0o640
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["link.strm", "out.strm"]
+
+    def fail(src, dst):
+        raise OSError("boom")
+
+    monkeypatch.setattr(os, "replace", fail)
+    with pytest.raises(OSError):
+        _write_atomic(target, b"new")
+    assert target.read_bytes() == b"https://ex|a=b\n"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["link.strm", "out.strm"]
+
+
+def test_fast_arg_parsing_matches_argparse():
+    argv = ["curl https://ex", "--title=My Show", "--yt-dlp", "--script-format", "ps1", "--dry-run"]
+    assert vars(_fast_parse_args(argv)) == vars(_build_parser().parse_args(argv))
+    # Anything unusual is left to argparse.
+    assert _fast_parse_args(["--help"]) is None
+    assert _fast_parse_args(["--script-format", "zsh"]) is None
+    assert _fast_parse_args(["-t"]) is None